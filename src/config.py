@@ -1,5 +1,6 @@
 import os
 import json
+from export_plan import ExportPlan, PLAN_KEYS
 
 class Config:
     #DB_PATH = os.path.join(os.path.expanduser("~"), "time_tracker.db")
@@ -13,15 +14,19 @@ class Config:
             "start_cell": "B1",
             "end_cell": "C1",
             "duration_cell": "D1",
+            "tag_cell": '',
             "date_based_export": True,
             "excel_path": '',
             "db_path": '',
             "minimized": False
         }
+        self._export_plan = None
         self.load()
 
     def set(self, key, value):
         """ Set the configuration key to the given value """
+        if key in PLAN_KEYS and self.settings.get(key) != value:
+            self._export_plan = None  # The compiled export layout is out of date
         self.settings[key] = value
         self.save()
 
@@ -29,6 +34,25 @@ class Config:
         """ Get the configuration value for the key, or return default if key does not exist """
         return self.settings.get(key, default)
 
+    def set_export_settings(self, values):
+        """
+        Set several export settings at once together with their compiled layout.
+        The layout is only recompiled if it changed; an invalid one raises ValueError and nothing is stored.
+        """
+        plan = self._export_plan
+        if plan is None or any(key in values and values[key] != self.settings.get(key) for key in PLAN_KEYS):
+            plan = ExportPlan.from_config({**self.settings, **values})
+        self.settings.update(values)
+        self._export_plan = plan
+        self.save()
+        return plan
+
+    def get_export_plan(self):
+        """ Get the compiled export layout, compiling it on first use after a change """
+        if self._export_plan is None:
+            self._export_plan = ExportPlan.from_config(self)
+        return self._export_plan
+
     def save(self):
         """ Save the configuration to a JSON file """
         try:
@@ -43,6 +67,7 @@ class Config:
             try:
                 with open(self.CONFIG_FILE, 'r') as config_file:
                     self.settings.update(json.load(config_file))
+                self._export_plan = None
             except Exception as e:
                 print(f"Error loading config: {e}")
 
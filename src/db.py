@@ -1,5 +1,16 @@
 import sqlite3
 import os
+import datetime
+from timeline import DayTimeline, SECONDS_PER_DAY, OFF
+
+# Key used in daily_tag_totals for sessions that were recorded without a tag
+UNTAGGED_ID = 0
+
+
+def _sql_duration(seconds):
+    """SQL selecting an HH:MM:SS duration followed by the raw seconds of the given expression."""
+    return f"printf('%02d:%02d:%02d', {seconds} / 3600, {seconds} % 3600 / 60, {seconds} % 60), {seconds}"
+
 
 class WorkSessionDB:
     def __init__(self, db_path):
@@ -9,35 +20,138 @@ class WorkSessionDB:
         self.create_table()
 
     def create_table(self):
-        """Create a table for storing work sessions if it doesn't already exist."""
+        """Create the tables for storing work sessions and tags if they don't already exist."""
         query = '''CREATE TABLE IF NOT EXISTS work_sessions (
                         id INTEGER PRIMARY KEY AUTOINCREMENT,
                         start_time TEXT NOT NULL,
                         end_time TEXT NOT NULL,
-                        duration TEXT NOT NULL
+                        duration TEXT NOT NULL,
+                        tag_id INTEGER REFERENCES tags(id)
                     )'''
         self.cursor.execute(query)
+        self.cursor.execute('''CREATE TABLE IF NOT EXISTS tags (
+                                   id INTEGER PRIMARY KEY AUTOINCREMENT,
+                                   name TEXT NOT NULL UNIQUE
+                               )''')
+
+        # Databases created before tagging was introduced lack the tag_id column
+        columns = [row[1] for row in self.cursor.execute("PRAGMA table_info(work_sessions)")]
+        if "tag_id" not in columns:
+            self.cursor.execute("ALTER TABLE work_sessions ADD COLUMN tag_id INTEGER REFERENCES tags(id)")
+
+        self.cursor.execute('''CREATE INDEX IF NOT EXISTS idx_work_sessions_start_time
+                               ON work_sessions (start_time)''')
+        self.cursor.execute('''CREATE INDEX IF NOT EXISTS idx_work_sessions_tag_start
+                               ON work_sessions (tag_id, start_time)''')
+
+        # Per-tag daily totals are maintained on insert so reports never have to scan work_sessions
+        self.cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'daily_tag_totals'")
+        totals_exist = self.cursor.fetchone() is not None
+        self.cursor.execute('''CREATE TABLE IF NOT EXISTS daily_tag_totals (
+                                   day TEXT NOT NULL,
+                                   tag_id INTEGER NOT NULL,
+                                   seconds INTEGER NOT NULL,
+                                   PRIMARY KEY (day, tag_id)
+                               ) WITHOUT ROWID''')
+        if not totals_exist:
+            # Backfill the aggregate from sessions recorded before it existed
+            self.cursor.execute('''INSERT INTO daily_tag_totals (day, tag_id, seconds)
+                                   SELECT DATE(start_time), COALESCE(tag_id, ?), SUM(CAST(duration AS INTEGER))
+                                   FROM work_sessions
+                                   GROUP BY DATE(start_time), COALESCE(tag_id, ?)''',
+                                (UNTAGGED_ID, UNTAGGED_ID))
+
+        # One run-length encoded blob per day, with the day's active total kept alongside it
+        self.cursor.execute('''CREATE TABLE IF NOT EXISTS activity_timeline (
+                                   day TEXT PRIMARY KEY,
+                                   runs BLOB NOT NULL,
+                                   active_seconds INTEGER NOT NULL,
+                                   last_seen INTEGER
+                               ) WITHOUT ROWID''')
+        columns = [row[1] for row in self.cursor.execute("PRAGMA table_info(activity_timeline)")]
+        if "last_seen" not in columns:
+            self.cursor.execute("ALTER TABLE activity_timeline ADD COLUMN last_seen INTEGER")
         self.conn.commit()
 
-    def add_session(self, start_time, end_time, duration):
-        """Add a new session to the database."""
-        query = '''INSERT INTO work_sessions (start_time, end_time, duration)
-                   VALUES (?, ?, ?)'''
-        self.cursor.execute(query, (start_time, end_time, duration))
+    def add_session(self, start_time, end_time, duration, tag_id=None):
+        """Add a new session to the database and update the per-tag daily total."""
+        query = '''INSERT INTO work_sessions (start_time, end_time, duration, tag_id)
+                   VALUES (?, ?, ?, ?)'''
+        self.cursor.execute(query, (start_time, end_time, duration, tag_id))
+        # Sessions are attributed to the day they started on
+        day = start_time.date().isoformat() if hasattr(start_time, "date") else str(start_time)[:10]
+        query = '''INSERT INTO daily_tag_totals (day, tag_id, seconds)
+                   VALUES (?, ?, ?)
+                   ON CONFLICT (day, tag_id) DO UPDATE SET seconds = seconds + excluded.seconds'''
+        self.cursor.execute(query, (day, tag_id if tag_id is not None else UNTAGGED_ID, int(duration)))
         self.conn.commit()
 
     def get_sessions(self, start_date=None):
         """Retrieve work sessions from the database, optionally starting from a specific date."""
         if start_date:
+            # Compare the raw column so the start_time index can be used
             query = '''SELECT start_time, end_time, duration
                        FROM work_sessions
-                       WHERE DATE(start_time) >= ?'''
+                       WHERE start_time >= ?
+                       ORDER BY start_time'''
             self.cursor.execute(query, (start_date.isoformat(),))
         else:
-            query = '''SELECT start_time, end_time, duration FROM work_sessions'''
+            query = '''SELECT start_time, end_time, duration FROM work_sessions ORDER BY start_time'''
             self.cursor.execute(query)
         return self.cursor.fetchall()
 
+    def iter_session_rows(self, start_date=None, date_based=False, chunk_size=10000):
+        """
+        Stream export-ready rows straight from a cursor in chunks of at most `chunk_size`.
+        Rows are (date, project, start, end, duration, seconds) tuples, formatted by SQLite; in
+        date-based mode there is one (date, start, end, duration, seconds) row per day with
+        sessions, aggregated like the Excel export.
+        """
+        where = "WHERE start_time >= ?" if start_date else ""
+        if date_based:
+            query = f'''SELECT substr(start_time, 1, 10), substr(MIN(start_time), 12, 8), substr(MAX(end_time), 12, 8),
+                               {_sql_duration("SUM(CAST(duration AS INTEGER))")}
+                        FROM work_sessions
+                        {where}
+                        GROUP BY substr(start_time, 1, 10)
+                        ORDER BY substr(start_time, 1, 10)'''
+        else:
+            query = f'''SELECT substr(start_time, 1, 10), COALESCE(tags.name, ''),
+                               substr(start_time, 12, 8), substr(end_time, 12, 8),
+                               {_sql_duration("CAST(duration AS INTEGER)")}
+                        FROM work_sessions
+                        LEFT JOIN tags ON tags.id = work_sessions.tag_id
+                        {where}
+                        ORDER BY start_time'''
+        return self._iter_chunks(query, (start_date.isoformat(),) if start_date else (), chunk_size)
+
+    def iter_tag_total_rows(self, start_date=None, chunk_size=10000):
+        """
+        Stream pre-aggregated per-project daily totals as (date, project, duration, seconds)
+        tuples in chunks of at most `chunk_size`, without touching work_sessions.
+        """
+        where = "WHERE t.day >= ?" if start_date else ""
+        query = f'''SELECT t.day, COALESCE(tags.name, ''), {_sql_duration("t.seconds")}
+                    FROM daily_tag_totals AS t
+                    LEFT JOIN tags ON tags.id = t.tag_id
+                    {where}
+                    ORDER BY t.day, tags.name'''
+        return self._iter_chunks(query, (start_date.isoformat(),) if start_date else (), chunk_size)
+
+    def _iter_chunks(self, query, params, chunk_size):
+        """Yield the results of a query in chunks of at most `chunk_size` rows."""
+        # A dedicated cursor keeps the stream independent from other queries on the connection
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            cursor.close()
+
     def get_last_session(self):
         """Retrieve the last saved work session from the database."""
         query = '''SELECT start_time, end_time, duration
@@ -47,6 +161,128 @@ class WorkSessionDB:
         self.cursor.execute(query)
         return self.cursor.fetchone()
 
+    def get_or_create_tag(self, name):
+        """Return the id of the tag with the given name, creating it if necessary."""
+        self.cursor.execute("INSERT OR IGNORE INTO tags (name) VALUES (?)", (name,))
+        self.conn.commit()
+        self.cursor.execute("SELECT id FROM tags WHERE name = ?", (name,))
+        return self.cursor.fetchone()[0]
+
+    def get_tags(self):
+        """Retrieve all tags as (id, name) tuples, ordered by name."""
+        self.cursor.execute("SELECT id, name FROM tags ORDER BY name")
+        return self.cursor.fetchall()
+
+    def get_total_for_day(self, day):
+        """Return the total tracked seconds for the given date across all tags."""
+        query = '''SELECT COALESCE(SUM(seconds), 0)
+                   FROM daily_tag_totals
+                   WHERE day = ?'''
+        self.cursor.execute(query, (day.isoformat(),))
+        return self.cursor.fetchone()[0]
+
+    def get_tag_totals(self, start_date=None, end_date=None):
+        """
+        Retrieve pre-aggregated per-tag daily totals as (day, tag_name, seconds) tuples.
+        Untagged time is reported with an empty tag name.
+        """
+        conditions, params = [], []
+        if start_date:
+            conditions.append("t.day >= ?")
+            params.append(start_date.isoformat())
+        if end_date:
+            conditions.append("t.day <= ?")
+            params.append(end_date.isoformat())
+        where = "WHERE " + " AND ".join(conditions) if conditions else ""
+        query = f'''SELECT t.day, COALESCE(tags.name, ''), t.seconds
+                    FROM daily_tag_totals AS t
+                    LEFT JOIN tags ON tags.id = t.tag_id
+                    {where}
+                    ORDER BY t.day, tags.name'''
+        self.cursor.execute(query, params)
+        return self.cursor.fetchall()
+
+    def save_timeline(self, timeline, last_seen=None):
+        """
+        Store the activity timeline of a single day, replacing any previous version.
+        `last_seen` is the last second of the day the application is known to have been running.
+        """
+        query = '''INSERT OR REPLACE INTO activity_timeline (day, runs, active_seconds, last_seen)
+                   VALUES (?, ?, ?, ?)'''
+        self.cursor.execute(query, (timeline.day.isoformat(), timeline.to_bytes(), timeline.active_seconds(),
+                                    last_seen if last_seen is not None else timeline.last_start))
+        self.conn.commit()
+
+    def touch_timeline(self, day, last_seen):
+        """Record that the application was still running at the given second of the day."""
+        query = '''UPDATE activity_timeline SET last_seen = ? WHERE day = ?'''
+        self.cursor.execute(query, (last_seen, day.isoformat()))
+        self.conn.commit()
+
+    def close_open_timeline(self):
+        """
+        Close the most recent timeline if the application stopped without recording it as closed
+        (crash, kill or shutdown), ending its last run at the last second it was seen running.
+        """
+        query = '''SELECT day, runs, last_seen
+                   FROM activity_timeline
+                   ORDER BY day DESC
+                   LIMIT 1'''
+        self.cursor.execute(query)
+        row = self.cursor.fetchone()
+        if not row:
+            return
+        timeline = DayTimeline.from_bytes(datetime.date.fromisoformat(row[0]), row[1])
+        if timeline.last_state in (None, OFF):
+            return
+        last_seen = row[2] if row[2] is not None else timeline.last_start
+        timeline.record(last_seen, OFF)
+        self.save_timeline(timeline, last_seen)
+
+    def load_timeline(self, day):
+        """Retrieve the activity timeline for the given date, or None if nothing was recorded."""
+        self.cursor.execute("SELECT runs FROM activity_timeline WHERE day = ?", (day.isoformat(),))
+        row = self.cursor.fetchone()
+        return DayTimeline.from_bytes(day, row[0]) if row else None
+
+    def get_active_seconds(self, start, end):
+        """
+        Return the number of active seconds recorded between two datetimes.
+        Only the boundary days (and today, whose last run is still open) are decoded;
+        complete days in between are summed from their stored totals.
+        """
+        if start >= end:
+            return 0
+        now = datetime.datetime.now()
+        today = now.date()
+        start_day, end_day = start.date(), end.date()
+
+        total = 0
+        interior_end = min(end_day, today)
+        if start_day < interior_end:
+            query = '''SELECT COALESCE(SUM(active_seconds), 0)
+                       FROM activity_timeline
+                       WHERE day > ? AND day < ?'''
+            self.cursor.execute(query, (start_day.isoformat(), interior_end.isoformat()))
+            total += self.cursor.fetchone()[0]
+
+        decode_days = {start_day, end_day}
+        if start_day < today < end_day:
+            decode_days.add(today)
+        for day in decode_days:
+            timeline = self.load_timeline(day)
+            if timeline is None:
+                continue
+            day_start = start - datetime.datetime.combine(day, datetime.time())
+            day_end = end - datetime.datetime.combine(day, datetime.time())
+            first = max(0, int(day_start.total_seconds()))
+            last = min(SECONDS_PER_DAY, int(day_end.total_seconds()))
+            if day == today:
+                # Nothing is known past the current moment
+                last = min(last, now.hour * 3600 + now.minute * 60 + now.second)
+            total += timeline.active_seconds(first, last)
+        return total
+
     def delete(self):
         """Delete the database file."""
         self.close()
@@ -0,0 +1,76 @@
+from utils import parse_cell
+
+# Config keys of the cell anchors, by the name of the field they receive
+ANCHOR_KEYS = {
+    "date": "date_cell",
+    "start": "start_cell",
+    "end": "end_cell",
+    "duration": "duration_cell",
+    "tag": "tag_cell",
+}
+# Config keys a compiled plan depends on
+PLAN_KEYS = frozenset(ANCHOR_KEYS.values()) | {"date_based"}
+
+# Row shapes produced by the exporter
+SESSION_FIELDS = ("date", "start", "end", "duration")
+TAG_FIELDS = ("date", "tag", "duration")
+
+
+class ExportPlan:
+    """
+    Compiled cell layout for exporting rows to a worksheet.
+
+    The anchors are parsed once into (row, column) integers. For a given row shape,
+    anchors on the same row in adjacent columns are merged into blocks, so a writer
+    can fill each block with a single range assignment.
+    """
+
+    def __init__(self, anchors, date_based=True):
+        self.date_based = date_based
+        # Fields without an anchor are not exported
+        self.anchors = {field: parse_cell(cell_ref) for field, cell_ref in anchors.items() if cell_ref}
+        self._blocks = {}
+        # Validate the row shapes the exporter writes up front
+        self.blocks(SESSION_FIELDS)
+        self.blocks(TAG_FIELDS)
+
+    @classmethod
+    def from_config(cls, cfg):
+        """Compile the plan from the export settings stored in the configuration."""
+        return cls({field: cfg.get(key, '') for field, key in ANCHOR_KEYS.items()},
+                   date_based=cfg.get('date_based', True))
+
+    def blocks(self, fields):
+        """
+        Return the blocks for rows whose values are ordered like `fields`, as
+        (row, column, indexes) tuples where `indexes` selects the row values of the block.
+        """
+        fields = tuple(fields)
+        if fields not in self._blocks:
+            placed = sorted((self.anchors[field], index) for index, field in enumerate(fields)
+                            if field in self.anchors)
+            # Every field is written downwards from its anchor, so a shared column would overwrite data
+            columns = {}
+            for (_, col), index in placed:
+                if col in columns:
+                    raise ValueError(f"The {fields[columns[col]]} and {fields[index]} cells are in the same column")
+                columns[col] = index
+            blocks = []
+            for (row, col), index in placed:
+                last = blocks[-1] if blocks else None
+                if last and last[0] == row and last[1] + len(last[2]) == col:
+                    last[2].append(index)
+                else:
+                    blocks.append((row, col, [index]))
+            self._blocks[fields] = [(row, col, tuple(indexes)) for row, col, indexes in blocks]
+        return self._blocks[fields]
+
+    def ranges(self, fields, count):
+        """
+        Return the target ranges for `count` rows as ((first_row, first_col), (last_row, last_col), indexes)
+        tuples, using 1-based worksheet coordinates.
+        """
+        if count <= 0:
+            return []
+        return [((row, col), (row + count - 1, col + len(indexes) - 1), indexes)
+                for row, col, indexes in self.blocks(fields)]
@@ -1,8 +1,10 @@
-from utils import format_duration, increment_cell_row
+from utils import format_duration
 from datetime import datetime
 import xlwings as xw
 from PyQt5 import QtWidgets
 from config import Config
+from writers import WRITERS, export_sessions
+from export_plan import SESSION_FIELDS, TAG_FIELDS
 
 
 class ExportConfigDialog(QtWidgets.QDialog):
@@ -24,6 +26,7 @@ class ExportConfigDialog(QtWidgets.QDialog):
         self.start_cell_input = QtWidgets.QLineEdit(self)
         self.end_cell_input = QtWidgets.QLineEdit(self)
         self.duration_cell_input = QtWidgets.QLineEdit(self)
+        self.tag_cell_input = QtWidgets.QLineEdit(self)
 
         # Add a starting date input
         self.start_date_input = QtWidgets.QDateEdit(self)
@@ -37,9 +40,12 @@ class ExportConfigDialog(QtWidgets.QDialog):
         self.start_cell_input.setText(self.config.get('start_cell', 'B1'))
         self.end_cell_input.setText(self.config.get('end_cell', 'C1'))
         self.duration_cell_input.setText(self.config.get('duration_cell', 'D1'))
+        self.tag_cell_input.setText(self.config.get('tag_cell', ''))
 
         self.date_based_check = QtWidgets.QCheckBox("date-based export", self)
         self.date_based_check.setChecked(self.config.get('date_based', True))
+        self.tag_based_check = QtWidgets.QCheckBox("per-project breakdown", self)
+        self.tag_based_check.setChecked(self.config.get('tag_based', False))
 
         self.save_button = QtWidgets.QPushButton('Save', self)
         self.cancel_button = QtWidgets.QPushButton('Cancel', self)
@@ -61,7 +67,10 @@ class ExportConfigDialog(QtWidgets.QDialog):
         layout.addWidget(self.end_cell_input)
         layout.addWidget(QtWidgets.QLabel("Duration Cell:"))
         layout.addWidget(self.duration_cell_input)
+        layout.addWidget(QtWidgets.QLabel("Project Cell:"))
+        layout.addWidget(self.tag_cell_input)
         layout.addWidget(self.date_based_check)
+        layout.addWidget(self.tag_based_check)
         layout.addWidget(self.save_button)
         layout.addWidget(self.cancel_button)
 
@@ -85,49 +94,58 @@ class ExportConfigDialog(QtWidgets.QDialog):
         start_cell = self.start_cell_input.text()
         end_cell = self.end_cell_input.text()
         duration_cell = self.duration_cell_input.text()
+        tag_cell = self.tag_cell_input.text()
         date_based = self.date_based_check.isChecked()
+        tag_based = self.tag_based_check.isChecked()
         start_date = self.start_date_input.date().toPyDate()
 
-        # Save these settings to config for future use
-        self.config.set('wb_sheet', sheet_name)
-        self.config.set('date_cell', date_cell)
-        self.config.set('start_cell', start_cell)
-        self.config.set('end_cell', end_cell)
-        self.config.set('duration_cell', duration_cell)
-        self.config.set('date_based', date_based)
+        if tag_based and not tag_cell:
+            QtWidgets.QMessageBox.warning(self, "Project Cell Required",
+                                          "Set a project cell for the per-project breakdown.")
+            return
 
-        # Export to Excel
-        self.write_to_excel(sheet_name, date_cell, start_cell, end_cell, duration_cell, date_based, start_date)
+        # Save these settings to config for future use; a rejected mapping is never persisted
+        try:
+            plan = self.config.set_export_settings({
+                'wb_sheet': sheet_name,
+                'date_cell': date_cell,
+                'start_cell': start_cell,
+                'end_cell': end_cell,
+                'duration_cell': duration_cell,
+                'tag_cell': tag_cell,
+                'date_based': date_based,
+                'tag_based': tag_based,
+            })
+        except ValueError as e:
+            QtWidgets.QMessageBox.critical(self, "Error", f"Invalid cell mapping: {e}")
+            return
+
+        # Export to Excel with the compiled plan
+        self.write_to_excel(sheet_name, plan, start_date, tag_based=tag_based)
         self.close_excel()
         self.accept()  # Close the dialog after saving
 
-    def write_to_excel(self, sheet_name, date_cell, start_cell, end_cell, duration_cell, date_based, start_date):
-        """Export session data to an Excel file."""
-        # Pass the start_date to get_sessions
-        sessions = self.db.get_sessions(start_date=start_date if start_date else None)
-
-        if date_based:
-            data = self.format_date_based_data(sessions)
+    def write_to_excel(self, sheet_name, plan, start_date, tag_based=False):
+        """Export session data to an Excel file using a compiled export plan."""
+        if tag_based:
+            # Per-project totals come from the pre-aggregated table, not from the raw sessions
+            data = self.format_tag_data(self.db.get_tag_totals(start_date=start_date if start_date else None))
+            fields = TAG_FIELDS
         else:
-            data = self.format_flat_data(sessions)
+            # Pass the start_date to get_sessions
+            sessions = self.db.get_sessions(start_date=start_date if start_date else None)
+            if plan.date_based:
+                data = self.format_date_based_data(sessions)
+            else:
+                data = self.format_flat_data(sessions)
+            fields = SESSION_FIELDS
 
         try:
             ws = self.workbook.sheets[sheet_name]
 
-            # Write data to the specified cells
-            for date, start_time, end_time, duration in data:
-                if date_cell:
-                    ws.range(date_cell).value = date
-                    date_cell = increment_cell_row(date_cell)
-                if start_cell:
-                    ws.range(start_cell).value = start_time
-                    start_cell = increment_cell_row(start_cell)
-                if end_cell:
-                    ws.range(end_cell).value = end_time
-                    end_cell = increment_cell_row(end_cell)
-                if duration_cell:
-                    ws.range(duration_cell).value = duration
-                    duration_cell = increment_cell_row(duration_cell)
+            # Write each block of adjacent columns with a single range assignment
+            for first, last, indexes in plan.ranges(fields, len(data)):
+                ws.range(first, last).value = [[row[i] for i in indexes] for row in data]
 
             # Save the workbook
             self.workbook.save()
@@ -146,6 +164,10 @@ class ExportConfigDialog(QtWidgets.QDialog):
             formatted.append((date, start_str, end_str, format_duration(duration)))
         return formatted
 
+    def format_tag_data(self, tag_totals):
+        """Format pre-aggregated per-tag daily totals as (date, project, duration) rows."""
+        return [(day, tag or "(none)", format_duration(seconds)) for day, tag, seconds in tag_totals]
+
     def format_date_based_data(self, sessions):
         """Format the data for date-based export, including placeholders for missing dates."""
         from collections import defaultdict
@@ -210,3 +232,19 @@ def handle_excel_export(db, cfg):
         # Open a dialog window for configuring the export settings
         dialog = ExportConfigDialog(excel_file, db, cfg)
         dialog.exec_()
+
+
+def handle_file_export(db, cfg):
+    """Handle exporting session data to a CSV, JSON Lines or Parquet file."""
+    filters = ';;'.join(f'{cls.__name__[:-len("Writer")]} (*{ext})' for ext, cls in WRITERS.items())
+    path, _ = QtWidgets.QFileDialog.getSaveFileName(None, 'Export Sessions', cfg.get('export_path', ''), filters)
+
+    if path:
+        cfg.set('export_path', path)
+        try:
+            count = export_sessions(db, path, date_based=cfg.get('date_based', True),
+                                    tag_based=cfg.get('tag_based', False))
+        except Exception as e:
+            QtWidgets.QMessageBox.critical(None, "Error", f"Failed to export sessions: {e}")
+        else:
+            QtWidgets.QMessageBox.information(None, "Export Complete", f"Exported {count} rows to {path}")
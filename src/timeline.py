@@ -0,0 +1,85 @@
+import sys
+from array import array
+from bisect import bisect_right
+
+# Activity states recorded in the timeline
+ACTIVE = 0
+IDLE = 1
+LOCKED = 2
+OFF = 3
+
+SECONDS_PER_DAY = 86400
+_STATE_BITS = 2
+_STATE_MASK = (1 << _STATE_BITS) - 1
+
+
+class DayTimeline:
+    """
+    Run-length encoded activity states for a single day.
+
+    Each entry is an unsigned 32-bit integer packing the second of the day at which
+    a run starts (upper bits) and the state of that run (lower 2 bits). A run lasts
+    until the next entry, the last one until the end of the day.
+    """
+
+    def __init__(self, day, runs=None):
+        self.day = day
+        self.runs = runs if runs is not None else array('I')
+
+    @classmethod
+    def from_bytes(cls, day, blob):
+        """Create a timeline from its stored little-endian representation."""
+        runs = array('I')
+        runs.frombytes(blob)
+        if sys.byteorder == 'big':
+            runs.byteswap()
+        return cls(day, runs)
+
+    def to_bytes(self):
+        """Return the little-endian representation used for storage."""
+        if sys.byteorder == 'big':
+            runs = array('I', self.runs)
+            runs.byteswap()
+            return runs.tobytes()
+        return self.runs.tobytes()
+
+    @property
+    def last_state(self):
+        """State of the last run, or None if nothing has been recorded."""
+        return self.runs[-1] & _STATE_MASK if self.runs else None
+
+    @property
+    def last_start(self):
+        """Second of the day at which the last run starts, or None if nothing has been recorded."""
+        return self.runs[-1] >> _STATE_BITS if self.runs else None
+
+    def record(self, second, state):
+        """Record that the given state starts at the given second of the day."""
+        second = max(0, min(int(second), SECONDS_PER_DAY - 1))
+        if self.runs:
+            if self.runs[-1] & _STATE_MASK == state:
+                return
+            # Transitions are appended in order; a backdated one cannot precede the last run
+            last_start = self.runs[-1] >> _STATE_BITS
+            if second <= last_start:
+                self.runs.pop()
+                second = last_start
+                if self.runs and self.runs[-1] & _STATE_MASK == state:
+                    return
+        self.runs.append((second << _STATE_BITS) | state)
+
+    def active_seconds(self, start=0, end=SECONDS_PER_DAY):
+        """Return the number of active seconds in [start, end) without expanding the runs."""
+        if not self.runs or start >= end:
+            return 0
+        # Index of the run containing `start`, found by binary search over the packed entries
+        index = max(bisect_right(self.runs, (start << _STATE_BITS) | _STATE_MASK) - 1, 0)
+        total = 0
+        for i in range(index, len(self.runs)):
+            run_start = self.runs[i] >> _STATE_BITS
+            if run_start >= end:
+                break
+            run_end = self.runs[i + 1] >> _STATE_BITS if i + 1 < len(self.runs) else SECONDS_PER_DAY
+            if self.runs[i] & _STATE_MASK == ACTIVE:
+                total += max(0, min(run_end, end) - max(run_start, start))
+        return total
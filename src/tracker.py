@@ -10,13 +10,15 @@ import win32con
 import win32gui
 import win32ts
 from db import WorkSessionDB
-from exporter import handle_excel_export
+from exporter import handle_excel_export, handle_file_export
+from timeline import DayTimeline, ACTIVE, IDLE, LOCKED, OFF, SECONDS_PER_DAY
 
 
 class TimeTrackerApp(QtWidgets.QWidget):
     def __init__(self, db, cfg):
         super().__init__()
         self.db = db  # WorkSessionDB instance for database access
+        self.cfg = cfg
         self.start_time = None
         self.end_time = None
         self.timer = QtCore.QTimer(self)
@@ -25,18 +27,30 @@ class TimeTrackerApp(QtWidgets.QWidget):
         self.idle_threshold = 300  # 5 minutes
         self.session_was_stopped_due_to_idle = False
         self.session_was_stopped_due_to_lock = False
+        # Opt-in activity timeline; idle periods shorter than the threshold count as active
+        self.timeline = None
+        self.activity_state = ACTIVE
+        self.activity_idle_threshold = self.cfg.get("activity_idle_threshold", 60)
+        if self.cfg.get("activity_timeline", False):
+            # A previous run that ended without recording OFF would otherwise count as active until midnight
+            self.db.close_open_timeline()
+            self.record_activity(ACTIVE, time.time())
         self.start_inactivity_monitor()
         self.register_session_monitor()
 
         # UI elements
         self.init_ui()
-        # Check if the app shall start minimized
-        self.cfg = cfg
+        # Restore the last selected project tag
+        self.current_tag = self.cfg.get("current_tag", "")
+        # Resolved once so closing a segment costs a single write
+        self.current_tag_id = self.db.get_or_create_tag(self.current_tag) if self.current_tag else None
+        self.tag_combo.setCurrentText(self.current_tag)
         # Check for daily limit in config
         self.daily_limit = self.cfg.get("daily_limit")
         if self.daily_limit is None:
             self.daily_limit = self.prompt_for_daily_limit()  # Ask the user for the daily limit
             self.cfg.set("daily_limit", self.daily_limit)  # Save it to the config
+        # Check if the app shall start minimized
         if self.cfg.get("minimized", True):
             QtCore.QTimer.singleShot(0, self.minimize_to_tray)
             # start session automatically on minimized startup
@@ -52,8 +66,19 @@ class TimeTrackerApp(QtWidgets.QWidget):
         self.start_button = QtWidgets.QPushButton('Start', self)
         self.stop_button = QtWidgets.QPushButton('Stop', self)
         self.export_button = QtWidgets.QPushButton('Export to Excel', self)
+        self.file_export_button = QtWidgets.QPushButton('Export to File', self)
         self.reset_button = QtWidgets.QPushButton('Reset', self)
 
+        # Editable project selector; typing a new name and pressing Enter creates the tag
+        self.tag_combo = QtWidgets.QComboBox(self)
+        self.tag_combo.setEditable(True)
+        self.tag_combo.setInsertPolicy(QtWidgets.QComboBox.NoInsert)
+        self.tag_combo.lineEdit().setPlaceholderText("Project / task")
+        self.tag_combo.addItems([name for _, name in self.db.get_tags()])
+        self.tag_combo.activated[str].connect(self.switch_tag)
+        # With NoInsert, Enter on a name that is not listed yet does not emit activated
+        self.tag_combo.lineEdit().returnPressed.connect(lambda: self.switch_tag(self.tag_combo.currentText()))
+
         # Add a label to display the running duration
         self.duration_label = QtWidgets.QLabel("Duration: 00:00:00", self)
         self.duration_label.setAlignment(QtCore.Qt.AlignCenter)
@@ -61,6 +86,7 @@ class TimeTrackerApp(QtWidgets.QWidget):
         self.start_button.clicked.connect(self.start_session)
         self.stop_button.clicked.connect(self.stop_session)
         self.export_button.clicked.connect(self.export_to_excel)
+        self.file_export_button.clicked.connect(self.export_to_file)
         self.reset_button.clicked.connect(self.reset_app)
         self.reset_button.setStyleSheet("font-size: 12px; color: red;")
         self.reset_button.setFixedSize(80, 30)
@@ -71,9 +97,11 @@ class TimeTrackerApp(QtWidgets.QWidget):
         # Layout setup
         layout = QtWidgets.QVBoxLayout(self)
         layout.addWidget(self.duration_label)  # Add the duration label to the layout
+        layout.addWidget(self.tag_combo)
         layout.addWidget(self.start_button)
         layout.addWidget(self.stop_button)
         layout.addWidget(self.export_button)
+        layout.addWidget(self.file_export_button)
         layout.addWidget(self.reset_button)  # Add the Reset button to the layout
         self.setLayout(layout)
 
@@ -81,6 +109,10 @@ class TimeTrackerApp(QtWidgets.QWidget):
         """Handle exporting session data to Excel."""
         handle_excel_export(self.db, self.cfg)
 
+    def export_to_file(self):
+        """Handle exporting session data to a CSV, JSON Lines or Parquet file."""
+        handle_file_export(self.db, self.cfg)
+
     def update_tray_menu(self):
         if self.tray_icon:
             tray_menu = QMenu()
@@ -88,6 +120,14 @@ class TimeTrackerApp(QtWidgets.QWidget):
             start_action.setEnabled(self.start_button.isEnabled())
             stop_action = tray_menu.addAction("Stop Session")
             stop_action.setEnabled(self.stop_button.isEnabled())
+            tag_menu = tray_menu.addMenu("Project")
+            tag_group = QtWidgets.QActionGroup(tag_menu)
+            for name in [""] + [name for _, name in self.db.get_tags()]:
+                tag_action = tag_menu.addAction(name or "(none)")
+                tag_action.setCheckable(True)
+                tag_action.setChecked(name == self.current_tag)
+                tag_action.setActionGroup(tag_group)
+                tag_action.triggered.connect(lambda _checked, tag=name: self.switch_tag(tag))
             restore_action = tray_menu.addAction("Restore")
             Close_action = tray_menu.addAction("Close")
 
@@ -153,7 +193,7 @@ class TimeTrackerApp(QtWidgets.QWidget):
             self.end_time = datetime.datetime.now()
             total_seconds = int((self.end_time - self.start_time).total_seconds())
             # Log the session to the database (store duration in seconds)
-            self.db.add_session(self.start_time, self.end_time, total_seconds)
+            self.db.add_session(self.start_time, self.end_time, total_seconds, self.current_tag_id)
             # Stop the timer and reset buttons
             self.timer.stop()
             self.start_time = None
@@ -161,11 +201,34 @@ class TimeTrackerApp(QtWidgets.QWidget):
             self.stop_button.setEnabled(False)
             self.update_tray_menu()
 
+    def switch_tag(self, tag):
+        """Switch the active project tag, closing the running segment and opening a new one."""
+        tag = tag.strip()
+        if tag == self.current_tag:
+            return
+        # Register the tag up front so it shows up in the selectors right away
+        tag_id = self.db.get_or_create_tag(tag) if tag else None
+        if tag and self.tag_combo.findText(tag) < 0:
+            self.tag_combo.addItem(tag)
+        session_running = self.start_time is not None
+        if session_running:
+            self.stop_session()
+        self.current_tag = tag
+        self.current_tag_id = tag_id
+        self.cfg.set("current_tag", tag)
+        self.tag_combo.setCurrentText(tag)
+        if session_running:
+            self.start_session()
+        else:
+            self.update_tray_menu()
+
     @QtCore.pyqtSlot()
     def exit_app(self):
         """Exit the application gracefully."""
         # Stop the session
         self.stop_session()
+        if self.timeline is not None:
+            self.record_activity(OFF, time.time())
         # Close the tray icon if it exists
         if self.tray_icon:
             self.tray_icon.hide()
@@ -193,11 +256,64 @@ class TimeTrackerApp(QtWidgets.QWidget):
             return millis / 1000.0
         return 0
 
+    @QtCore.pyqtSlot(int, float)
+    def record_activity(self, state, timestamp):
+        """Record an activity state change in the timeline of the day it happened on."""
+        moment = datetime.datetime.fromtimestamp(timestamp)
+        day = moment.date()
+        second = moment.hour * 3600 + moment.minute * 60 + moment.second
+        if self.timeline is not None and day < self.timeline.day:
+            # A transition backdated past midnight starts the current day; the timeline never moves back a day
+            day, second = self.timeline.day, 0
+        if self.timeline is None or self.timeline.day != day:
+            carried_state = self.timeline.last_state if self.timeline is not None else None
+            self.timeline = self.db.load_timeline(day) or DayTimeline(day)
+            # A run that was open at midnight continues into the new day
+            if carried_state is not None and carried_state != OFF and self.timeline.last_state is None:
+                self.timeline.record(0, carried_state)
+        self.timeline.record(second, state)
+        self.db.save_timeline(self.timeline, self.seconds_seen_on(day))
+
+    def seconds_seen_on(self, day):
+        """Return the last second of the given day at which the application is known to be running."""
+        now = datetime.datetime.now()
+        if now.date() != day:
+            return SECONDS_PER_DAY - 1
+        return now.hour * 3600 + now.minute * 60 + now.second
+
+    @QtCore.pyqtSlot()
+    def touch_activity(self):
+        """Persist the last second the application was seen running, so a crash can be closed off."""
+        if self.timeline is not None:
+            self.db.touch_timeline(self.timeline.day, self.seconds_seen_on(self.timeline.day))
+
+    def log_activity(self, state, timestamp=None):
+        """Queue an activity state change for recording on the GUI thread."""
+        self.activity_state = state
+        if self.timeline is not None:
+            QtCore.QMetaObject.invokeMethod(self, "record_activity", QtCore.Qt.QueuedConnection,
+                                            QtCore.Q_ARG(int, state),
+                                            QtCore.Q_ARG(float, timestamp or time.time()))
+
     def start_inactivity_monitor(self):
         """Start a thread to monitor user inactivity."""
         def monitor():
+            last_day = datetime.date.today()
+            last_heartbeat = time.time()
             while True:
                 idle_time = self.get_idle_duration()
+                # Idle and active periods are backdated to the last input event
+                if self.activity_state == ACTIVE and idle_time >= self.activity_idle_threshold:
+                    self.log_activity(IDLE, time.time() - idle_time)
+                elif self.activity_state == IDLE and idle_time < self.activity_idle_threshold:
+                    self.log_activity(ACTIVE, time.time() - idle_time)
+                elif datetime.date.today() != last_day:
+                    # Roll the timeline over so days without transitions are still recorded
+                    self.log_activity(self.activity_state)
+                last_day = datetime.date.today()
+                if self.timeline is not None and time.time() - last_heartbeat >= 60:
+                    QtCore.QMetaObject.invokeMethod(self, "touch_activity", QtCore.Qt.QueuedConnection)
+                    last_heartbeat = time.time()
                 if idle_time >= self.idle_threshold:
                     if self.start_time is not None and not self.session_was_stopped_due_to_idle:
                         QtCore.QMetaObject.invokeMethod(self, "stop_session", QtCore.Qt.QueuedConnection)
@@ -218,10 +334,12 @@ class TimeTrackerApp(QtWidgets.QWidget):
             def wnd_proc(hwnd, msg, wparam, lparam):
                 if msg == 0x02B1:  # WM_WTSSESSION_CHANGE
                     if wparam == 0x7:  # WTS_SESSION_LOCK
+                        self.log_activity(LOCKED)
                         if self.start_time is not None:
                             QtCore.QMetaObject.invokeMethod(self, "stop_session", QtCore.Qt.QueuedConnection)
                             self.session_was_stopped_due_to_lock = True
                     elif wparam == 0x8:  # WTS_SESSION_UNLOCK
+                        self.log_activity(ACTIVE)
                         if self.session_was_stopped_due_to_lock:
                             QtCore.QMetaObject.invokeMethod(self, "start_session", QtCore.Qt.QueuedConnection)
                             self.session_was_stopped_due_to_lock = False
@@ -305,9 +423,7 @@ class TimeTrackerApp(QtWidgets.QWidget):
     def get_total_time_today(self):
         """Calculate the total session time for the current day."""
         today = datetime.datetime.now().date()
-        sessions = self.db.get_sessions(today)
-        total_seconds = sum(int(session[2]) for session in sessions)
-        return total_seconds
+        return self.db.get_total_for_day(today)
 
     def check_daily_limit(self):
         """Check if the total duration for the day exceeds 8 hours."""
@@ -14,6 +14,20 @@ def increment_cell_row(cell_ref):
         raise ValueError(f"Invalid cell reference: {cell_ref}")
 
 
+def parse_cell(cell_ref):
+    """
+    Parses an Excel cell reference into 1-based (row, column) integers.
+    E.g., 'A1' -> (1, 1), 'AB10' -> (10, 28)
+    """
+    match = re.fullmatch(r"([A-Z]+)([0-9]+)", cell_ref.strip(), re.I)
+    if not match or int(match.group(2)) == 0:
+        raise ValueError(f"Invalid cell reference: {cell_ref}")
+    col = 0
+    for letter in match.group(1).upper():
+        col = col * 26 + ord(letter) - ord('A') + 1
+    return int(match.group(2)), col
+
+
 def format_duration(seconds):
     hours, remainder = divmod(int(seconds), 3600)
     minutes, seconds = divmod(remainder, 60)
@@ -0,0 +1,171 @@
+import argparse
+import csv
+import json
+import os
+from abc import ABC, abstractmethod
+from datetime import date, timedelta
+
+# Columns of the rows produced by each export mode
+FLAT_COLUMNS = ("date", "project", "start", "end", "duration", "seconds")
+DATE_BASED_COLUMNS = ("date", "start", "end", "duration", "seconds")
+TAG_COLUMNS = ("date", "project", "duration", "seconds")
+
+
+class SessionWriter(ABC):
+    """
+    Base class for headless exporters. Rows are written in chunks as they arrive,
+    so memory use is bounded by the chunk size rather than the number of sessions.
+    """
+    extension = None
+
+    def __init__(self, path, columns):
+        self.path = path
+        self.columns = columns
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @abstractmethod
+    def open(self):
+        """Create the output file and write any header."""
+
+    @abstractmethod
+    def write_chunk(self, rows):
+        """Write a list of row tuples ordered like `columns`."""
+
+    @abstractmethod
+    def close(self):
+        """Flush and close the output file."""
+
+
+class CsvWriter(SessionWriter):
+    extension = ".csv"
+
+    def open(self):
+        self.file = open(self.path, "w", newline="", encoding="utf-8")
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(self.columns)
+
+    def write_chunk(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.file.close()
+
+
+class JsonLinesWriter(SessionWriter):
+    extension = ".jsonl"
+
+    def open(self):
+        self.file = open(self.path, "w", encoding="utf-8")
+        self.encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+    def write_chunk(self, rows):
+        encode, columns = self.encoder.encode, self.columns
+        self.file.write("".join(encode(dict(zip(columns, row))) + "\n" for row in rows))
+
+    def close(self):
+        self.file.close()
+
+
+class ParquetWriter(SessionWriter):
+    """Columnar output; each chunk becomes one Parquet row group. Requires the optional `pyarrow` package."""
+    extension = ".parquet"
+
+    def open(self):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise RuntimeError("Parquet export requires the 'pyarrow' package (pip install pyarrow)")
+        self.pa = pyarrow
+        self.schema = pyarrow.schema([(name, pyarrow.int64() if name == "seconds" else pyarrow.string())
+                                      for name in self.columns])
+        self.writer = pyarrow.parquet.ParquetWriter(self.path, self.schema)
+
+    def write_chunk(self, rows):
+        # Transpose the row chunk into columns
+        columns = list(zip(*rows))
+        self.writer.write_table(self.pa.Table.from_arrays(
+            [self.pa.array(column, type=field.type) for column, field in zip(columns, self.schema)],
+            schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+WRITERS = {cls.extension: cls for cls in (CsvWriter, JsonLinesWriter, ParquetWriter)}
+
+
+def get_writer(path, columns):
+    """Return a writer for the given output path, chosen by its file extension."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in WRITERS:
+        raise ValueError(f"Unsupported export format: {extension or path}")
+    return WRITERS[extension](path, columns)
+
+
+def fill_missing_dates(chunks):
+    """Insert placeholder rows for days without sessions into a stream of date-based chunks."""
+    previous = None
+    for rows in chunks:
+        filled = []
+        for row in rows:
+            current = date.fromisoformat(row[0])
+            if previous is not None:
+                for i in range(1, (current - previous).days):
+                    filled.append(((previous + timedelta(days=i)).isoformat(), "", "", "", None))
+            filled.append(row)
+            previous = current
+        yield filled
+
+
+def export_sessions(db, path, date_based=False, start_date=None, chunk_size=10000, tag_based=False):
+    """
+    Export sessions to the file at `path` without any UI. Returns the number of rows written.
+    With `tag_based`, per-project daily totals are exported instead of sessions.
+    """
+    if tag_based:
+        chunks = db.iter_tag_total_rows(start_date=start_date, chunk_size=chunk_size)
+        columns = TAG_COLUMNS
+    elif date_based:
+        chunks = fill_missing_dates(db.iter_session_rows(start_date=start_date, date_based=True,
+                                                         chunk_size=chunk_size))
+        columns = DATE_BASED_COLUMNS
+    else:
+        chunks = db.iter_session_rows(start_date=start_date, chunk_size=chunk_size)
+        columns = FLAT_COLUMNS
+    count = 0
+    with get_writer(path, columns) as writer:
+        for rows in chunks:
+            writer.write_chunk(rows)
+            count += len(rows)
+    return count
+
+
+def main():
+    from db import WorkSessionDB
+
+    parser = argparse.ArgumentParser(description="Export work sessions without starting the UI.")
+    parser.add_argument("db_path", help="Path to the session database")
+    parser.add_argument("output", help="Output file (" + ", ".join(WRITERS) + ")")
+    parser.add_argument("--date-based", action="store_true", help="Export one row per day")
+    parser.add_argument("--per-project", action="store_true", help="Export daily totals per project")
+    parser.add_argument("--start-date", type=date.fromisoformat, help="First date to export (YYYY-MM-DD)")
+    args = parser.parse_args()
+
+    db = WorkSessionDB(args.db_path)
+    try:
+        count = export_sessions(db, args.output, date_based=args.date_based, start_date=args.start_date,
+                                tag_based=args.per_project)
+    finally:
+        db.close()
+    print(f"Exported {count} rows to {args.output}")
+
+
+if __name__ == '__main__':
+    main()